@@ -2,8 +2,10 @@
 Script para análise de espaço entre armazenamento normalizado vs JSON comprimido
 """
 
+import atexit
+import sys
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 import polars as pl
 
@@ -23,41 +25,74 @@ class StorageAnalyzer:
             "task_sla",
             "time_worked",
         ]
+        self._conn = None
+
+    def _get_conn(self):
+        """
+        Retorna a conexão do analisador, aberta na primeira chamada e
+        reaproveitada por todas as consultas até close()
+        """
+        if self._conn is None:
+            self._conn = get_db_connection()
+            atexit.register(self.close)
+        return self._conn
+
+    def close(self):
+        """Fecha a conexão do analisador, se aberta"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
 
     def get_table_sizes(self) -> Dict[str, Dict]:
-        """Obtém tamanhos das tabelas normalizadas"""
-        table_sizes = {}
+        """
+        Obtém tamanhos das tabelas normalizadas
+
+        Usa os metadados de sys.dm_db_partition_stats (heap/índice clustered)
+        em uma única consulta, sem varrer as tabelas.
+        """
+        table_sizes = {
+            table: {"records": 0, "size_kb": 0}
+            for table in self.normalized_tables
+        }
 
-        with get_db_connection() as conn:
+        object_ids = ", ".join(
+            f"OBJECT_ID('{table}')" for table in self.normalized_tables
+        )
+        query = f"""
+        SELECT
+            OBJECT_NAME(object_id) as table_name,
+            SUM(row_count) as record_count,
+            SUM(used_page_count) * 8.0 as size_kb
+        FROM sys.dm_db_partition_stats
+        WHERE object_id IN ({object_ids})
+            AND index_id IN (0, 1)
+        GROUP BY object_id
+        """
+
+        with self._get_conn() as conn:
             cursor = conn.cursor()
 
-            for table in self.normalized_tables:
-                query = f"""
-                SELECT 
-                    COUNT(*) as record_count,
-                    SUM(DATALENGTH(*)) / 1024.0 as size_kb
-                FROM {table}
-                """
-                try:
-                    cursor.execute(query)
-                    result = cursor.fetchone()
-
-                    if result:
-                        table_sizes[table] = {
-                            "records": result[0] or 0,
-                            "size_kb": round(result[1] or 0, 2),
-                        }
-                    else:
-                        table_sizes[table] = {"records": 0, "size_kb": 0}
-
-                except Exception as e:
-                    print(f"⚠️ Erro ao analisar tabela {table}: {e}")
-                    table_sizes[table] = {"records": 0, "size_kb": 0}
+            try:
+                cursor.execute(query)
+
+                for table, record_count, size_kb in cursor.fetchall():
+                    table_sizes[table] = {
+                        "records": record_count or 0,
+                        "size_kb": round(float(size_kb or 0), 2),
+                    }
+
+            except Exception as e:
+                print(f"⚠️ Erro ao analisar tabelas: {e}")
 
         return table_sizes
 
     def get_json_data_sizes(self) -> Dict[str, Any]:
-        """Obtém tamanhos dos dados JSON"""
+        """
+        Obtém tamanhos dos dados JSON
+
+        Os totais são agregados no próprio SQL Server; apenas as extrações
+        mais recentes são trazidas linha a linha para exibição.
+        """
         json_sizes = {
             "total_records": 0,
             "total_json_size_kb": 0,
@@ -66,73 +101,81 @@ class StorageAnalyzer:
             "entries": [],
         }
 
-        with get_db_connection() as conn:
+        with self._get_conn() as conn:
             cursor = conn.cursor()
 
-            query = """
-            SELECT 
-                data_extraction,
-                extraction_type,
-                record_count,
-                json_size_kb,
-                compressed_size_kb,
-                compression_ratio,
-                created_at
-            FROM servicenow_data_json
-            ORDER BY created_at DESC
-            """
-
             try:
-                cursor.execute(query)
-                results = cursor.fetchall()
-
-                for row in results:
-                    entry = {
-                        "date": row[0],
-                        "type": row[1],
-                        "records": row[2] or 0,
-                        "json_size_kb": row[3] or 0,
-                        "compressed_size_kb": row[4] or 0,
-                        "compression_ratio": row[5] or 0,
-                        "created_at": row[6],
-                    }
-
-                    json_sizes["entries"].append(entry)
-                    json_sizes["total_records"] += entry["records"]
-                    json_sizes["total_json_size_kb"] += entry["json_size_kb"]
-                    json_sizes["total_compressed_size_kb"] += entry[
-                        "compressed_size_kb"
-                    ]
-
-                # Calcula média da compressão
-                if json_sizes["entries"]:
-                    valid_ratios = [
-                        e["compression_ratio"]
-                        for e in json_sizes["entries"]
-                        if e["compression_ratio"] > 0
-                    ]
-                    if valid_ratios:
-                        json_sizes["average_compression_ratio"] = sum(
-                            valid_ratios
-                        ) / len(valid_ratios)
+                json_sizes.update(self._get_json_totals(cursor))
+                json_sizes["entries"] = self._get_recent_json_entries(cursor)
 
             except Exception as e:
                 print(f"⚠️ Erro ao analisar dados JSON: {e}")
 
         return json_sizes
 
+    def _get_json_totals(self, cursor) -> Dict[str, float]:
+        """Soma registros/tamanhos e calcula a compressão média via SQL"""
+        query = """
+        SELECT
+            ISNULL(SUM(record_count), 0),
+            ISNULL(SUM(json_size_kb), 0),
+            ISNULL(SUM(compressed_size_kb), 0),
+            ISNULL(AVG(CASE WHEN compression_ratio > 0
+                            THEN compression_ratio END), 0)
+        FROM servicenow_data_json
+        """
+
+        cursor.execute(query)
+        records, json_kb, compressed_kb, avg_ratio = cursor.fetchone()
+
+        return {
+            "total_records": records,
+            "total_json_size_kb": float(json_kb),
+            "total_compressed_size_kb": float(compressed_kb),
+            "average_compression_ratio": float(avg_ratio),
+        }
+
+    def _get_recent_json_entries(self, cursor, limit: int = 5) -> List[Dict]:
+        """Busca as extrações JSON mais recentes para exibição"""
+        query = """
+        SELECT TOP (?)
+            data_extraction,
+            extraction_type,
+            record_count,
+            json_size_kb,
+            compressed_size_kb,
+            compression_ratio,
+            created_at
+        FROM servicenow_data_json
+        ORDER BY created_at DESC
+        """
+
+        cursor.execute(query, limit)
+
+        return [
+            {
+                "date": row[0],
+                "type": row[1],
+                "records": row[2] or 0,
+                "json_size_kb": row[3] or 0,
+                "compressed_size_kb": row[4] or 0,
+                "compression_ratio": row[5] or 0,
+                "created_at": row[6],
+            }
+            for row in cursor.fetchall()
+        ]
+
     def calculate_space_efficiency(self) -> Dict[str, Any]:
         """Calcula eficiência de espaço entre os modelos"""
         normalized_sizes = self.get_table_sizes()
         json_sizes = self.get_json_data_sizes()
 
         # Total do modelo normalizado
-        normalized_total_records = sum(
-            table["records"] for table in normalized_sizes.values()
-        )
-        normalized_total_size_kb = sum(
-            table["size_kb"] for table in normalized_sizes.values()
-        )
+        normalized_total_records = 0
+        normalized_total_size_kb = 0.0
+        for table in normalized_sizes.values():
+            normalized_total_records += table["records"]
+            normalized_total_size_kb += table["size_kb"]
 
         # Calcula eficiência
         efficiency = {
@@ -222,120 +265,139 @@ class StorageAnalyzer:
         else:
             return "🔴 Modelo normalizado é mais eficiente - Manter estrutura atual"
 
-    def print_detailed_analysis(self):
-        """Imprime análise detalhada de espaço"""
-        efficiency = self.calculate_space_efficiency()
+    def print_detailed_analysis(
+        self, efficiency: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Imprime análise detalhada de espaço
+
+        Args:
+            efficiency: Resultado de calculate_space_efficiency já calculado
+                (evita consultar o banco novamente)
+        """
+        if efficiency is None:
+            efficiency = self.calculate_space_efficiency()
 
-        print("=" * 80)
-        print("📊 ANÁLISE COMPARATIVA DE ARMAZENAMENTO - SERVICENOW")
-        print("=" * 80)
+        # Relatório montado em memória e escrito de uma vez só
+        lines = []
+
+        lines.append("=" * 80)
+        lines.append("📊 ANÁLISE COMPARATIVA DE ARMAZENAMENTO - SERVICENOW")
+        lines.append("=" * 80)
 
         # Modelo Normalizado
-        print("\n🏗️ MODELO NORMALIZADO (Atual):")
-        print("-" * 50)
+        lines.append("\n🏗️ MODELO NORMALIZADO (Atual):")
+        lines.append("-" * 50)
         normalized = efficiency["normalized"]
 
-        print(f"📈 Total de registros: {normalized['total_records']:,}")
-        print(
+        lines.append(f"📈 Total de registros: {normalized['total_records']:,}")
+        lines.append(
             f"💾 Tamanho total: {normalized['total_size_kb']:,.2f} KB ({normalized['total_size_kb'] / 1024:.2f} MB)"
         )
-        print(
+        lines.append(
             f"⚖️ Média por registro: {normalized['avg_bytes_per_record']:.1f} bytes"
         )
 
-        print("\n📋 Detalhamento por tabela:")
+        lines.append("\n📋 Detalhamento por tabela:")
         for table, data in normalized["tables"].items():
-            print(
+            lines.append(
                 f"   ├── {table:20} {data['records']:>8,} registros  {data['size_kb']:>8.1f} KB"
             )
 
         # Modelo JSON
-        print("\n🗜️ MODELO JSON COMPRIMIDO:")
-        print("-" * 50)
+        lines.append("\n🗜️ MODELO JSON COMPRIMIDO:")
+        lines.append("-" * 50)
         json_data = efficiency["json"]
 
         if json_data["total_records"] > 0:
-            print(f"📈 Total de registros: {json_data['total_records']:,}")
-            print(
+            lines.append(
+                f"📈 Total de registros: {json_data['total_records']:,}"
+            )
+            lines.append(
                 f"💾 Tamanho JSON: {json_data['json_size_kb']:,.2f} KB ({json_data['json_size_kb'] / 1024:.2f} MB)"
             )
-            print(
+            lines.append(
                 f"🗜️ Tamanho comprimido: {json_data['compressed_size_kb']:,.2f} KB ({json_data['compressed_size_kb'] / 1024:.2f} MB)"
             )
-            print(
+            lines.append(
                 f"📊 Compressão média: {json_data['avg_compression_ratio']:.1f}%"
             )
-            print(
+            lines.append(
                 f"⚖️ Média por registro (JSON): {json_data['avg_bytes_per_record_json']:.1f} bytes"
             )
-            print(
+            lines.append(
                 f"⚖️ Média por registro (comprimido): {json_data['avg_bytes_per_record_compressed']:.1f} bytes"
             )
 
             if json_data["entries"]:
-                print("\n📋 Extrações JSON realizadas:")
-                for entry in json_data["entries"][-5:]:  # Últimas 5 extrações
+                lines.append("\n📋 Extrações JSON realizadas:")
+                for entry in json_data["entries"]:  # Últimas 5 extrações
                     compression_display = (
                         f"{entry['compression_ratio']:.1f}%"
                         if entry["compression_ratio"] > 0
                         else "N/A"
                     )
-                    print(
+                    lines.append(
                         f"   ├── {entry['date']} ({entry['type']}) - {entry['records']:,} reg. - {entry['compressed_size_kb']:.1f} KB - {compression_display}"
                     )
         else:
-            print("ℹ️ Nenhum dado JSON encontrado no banco")
+            lines.append("ℹ️ Nenhum dado JSON encontrado no banco")
 
         # Comparação
-        print("\n⚖️ COMPARAÇÃO E RECOMENDAÇÕES:")
-        print("-" * 50)
+        lines.append("\n⚖️ COMPARAÇÃO E RECOMENDAÇÕES:")
+        lines.append("-" * 50)
         comparison = efficiency.get("comparison", {})
 
         if comparison.get("space_saved_vs_normalized_percent", 0) != 0:
             space_saved = comparison["space_saved_vs_normalized_percent"]
             ratio = comparison["json_vs_normalized_ratio"]
 
-            print(f"💡 Economia de espaço: {space_saved:+.1f}%")
-            print(
+            lines.append(f"💡 Economia de espaço: {space_saved:+.1f}%")
+            lines.append(
                 f"📏 Razão JSON/Normalizado: {ratio:.3f} ({ratio * 100:.1f}%)"
             )
-            print(f"🎯 Recomendação: {comparison['recommendation']}")
+            lines.append(f"🎯 Recomendação: {comparison['recommendation']}")
 
             # Projeções
             if space_saved > 0:
-                print("\n📊 PROJEÇÕES:")
+                lines.append("\n📊 PROJEÇÕES:")
                 annual_savings_mb = (
                     (normalized["total_size_kb"] * space_saved / 100)
                     / 1024
                     * 12
                 )  # Assumindo crescimento mensal
-                print(
+                lines.append(
                     f"   ├── Economia anual estimada: {annual_savings_mb:.1f} MB"
                 )
-                print(
+                lines.append(
                     f"   └── Em 5 anos: {annual_savings_mb * 5:.1f} MB ({annual_savings_mb * 5 / 1024:.2f} GB)"
                 )
         else:
-            print("ℹ️ Comparação não disponível - dados insuficientes")
+            lines.append("ℹ️ Comparação não disponível - dados insuficientes")
 
         # Vantagens e desvantagens
-        print("\n💭 CONSIDERAÇÕES TÉCNICAS:")
-        print("   🟢 Vantagens JSON comprimido:")
-        print("      ├── Flexibilidade de schema")
-        print("      ├── Facilidade para arquivamento")
-        print("      └── Menor complexidade de queries simples")
-        print("   🟠 Desvantagens JSON comprimido:")
-        print("      ├── Queries complexas menos eficientes")
-        print("      ├── Maior uso de CPU (compressão/descompressão)")
-        print("      └── Menos otimizado para joins")
-
-        print("\n" + "=" * 80)
+        lines.append("\n💭 CONSIDERAÇÕES TÉCNICAS:")
+        lines.append("   🟢 Vantagens JSON comprimido:")
+        lines.append("      ├── Flexibilidade de schema")
+        lines.append("      ├── Facilidade para arquivamento")
+        lines.append("      └── Menor complexidade de queries simples")
+        lines.append("   🟠 Desvantagens JSON comprimido:")
+        lines.append("      ├── Queries complexas menos eficientes")
+        lines.append("      ├── Maior uso de CPU (compressão/descompressão)")
+        lines.append("      └── Menos otimizado para joins")
+
+        lines.append("\n" + "=" * 80)
+
+        sys.stdout.write("\n".join(lines) + "\n")
 
     def export_analysis_to_csv(
-        self, output_file: str = "storage_analysis.csv"
+        self,
+        output_file: str = "storage_analysis.csv",
+        efficiency: Optional[Dict[str, Any]] = None,
     ):
         """Exporta análise para CSV"""
-        efficiency = self.calculate_space_efficiency()
+        if efficiency is None:
+            efficiency = self.calculate_space_efficiency()
 
         # Prepara dados para CSV
         rows = []
@@ -354,34 +416,56 @@ class StorageAnalyzer:
                 }
             )
 
-        # Dados JSON
-        for entry in efficiency["json"]["entries"]:
-            rows.append(
-                {
-                    "model": "json_compressed",
-                    "table_type": entry["type"],
-                    "date": entry["date"],
-                    "records": entry["records"],
-                    "size_kb": entry["json_size_kb"],
-                    "compressed_size_kb": entry["compressed_size_kb"],
-                    "compression_ratio": entry["compression_ratio"],
-                }
-            )
+        # Tabelas normalizadas vão primeiro (com cabeçalho); as extrações
+        # JSON são lidas do banco em lotes e anexadas ao mesmo arquivo, sem
+        # montar o DataFrame completo em memória
+        normalized_df = pl.DataFrame(rows)
+
+        with open(output_file, "wb") as csv_file:
+            normalized_df.write_csv(csv_file)
+
+            with self._get_conn() as conn:
+                query = """
+                SELECT
+                    'json_compressed' as model,
+                    extraction_type as table_type,
+                    CONVERT(NVARCHAR(10), data_extraction, 23) as date,
+                    record_count as records,
+                    CAST(json_size_kb AS FLOAT) as size_kb,
+                    CAST(compressed_size_kb AS FLOAT) as compressed_size_kb,
+                    CAST(compression_ratio AS FLOAT) as compression_ratio
+                FROM servicenow_data_json
+                ORDER BY created_at DESC
+                """
 
-        # Cria DataFrame e exporta
-        if rows:
-            df = pl.DataFrame(rows)
-            df.write_csv(output_file)
-            print(f"📁 Análise exportada para: {output_file}")
-        else:
-            print("⚠️ Nenhum dado para exportar")
+                # O cursor é nosso: read_database com iter_batches fecha o
+                # cursor que ele mesmo cria antes do primeiro fetchmany
+                cursor = conn.cursor()
+                cursor.execute(query)
+                columns = [column[0] for column in cursor.description]
+
+                while True:
+                    batch = cursor.fetchmany(10_000)
+                    if not batch:
+                        break
+
+                    pl.DataFrame(
+                        [tuple(row) for row in batch],
+                        schema=columns,
+                        orient="row",
+                    ).select(normalized_df.columns).write_csv(
+                        csv_file, include_header=False
+                    )
+
+        print(f"📁 Análise exportada para: {output_file}")
 
 
 def main():
     """Executa análise completa de armazenamento"""
     analyzer = StorageAnalyzer()
-    analyzer.print_detailed_analysis()
-    analyzer.export_analysis_to_csv()
+    efficiency = analyzer.calculate_space_efficiency()
+    analyzer.print_detailed_analysis(efficiency)
+    analyzer.export_analysis_to_csv(efficiency=efficiency)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,8 @@
-from typing import Dict
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import polars as pl
 import pyodbc
@@ -7,7 +11,21 @@ from settings.config import Config
 
 
 class DatabaseManager:
+    # Linhas enviadas por chamada de executemany
+    BATCH_ROWS = 1000
+    # Conexões mantidas abertas entre operações
+    POOL_SIZE = 8
+    # Conexões mais antigas que isso são recriadas
+    POOL_RECYCLE_SECONDS = 3600
+
     def __init__(self):
+        self._pool: "queue.LifoQueue[Tuple[pyodbc.Connection, float]]" = (
+            queue.LifoQueue(maxsize=self.POOL_SIZE)
+        )
+        # Conexão da transação aberta por transaction(), se houver
+        self._transaction: Optional[pyodbc.Connection] = None
+        self._transaction_lock = threading.Lock()
+        self._transaction_failed = False
         self.db_metrics = {
             "total_operations": 0,
             "total_db_time": 0.0,
@@ -21,73 +39,261 @@ class DatabaseManager:
     ) -> bool:
         """
         Salva DataFrames no banco de dados configurado via .env/config.py (SQL Server, etc).
+
+        As linhas são enviadas em lotes de BATCH_ROWS via executemany e todas
+        as tabelas são confirmadas em um único commit ao final. Dentro de
+        transaction() o commit fica para o fim do bloco.
         """
+        if self._transaction is not None:
+            return self._save_in_transaction(dataframes)
+
         success = True
-        conn_str = Config.get_db_connection_string()
 
         try:
-            conn = pyodbc.connect(conn_str)
-            cursor = conn.cursor()
-            for table_name, df in dataframes.items():
-                if df is None or df.is_empty():
-                    continue
-                columns = df.columns
-                # Cria a tabela se não existir (schema simples, pode ser adaptado)
-
-                col_defs = ", ".join(
-                    [f"[{col}] NVARCHAR(MAX)" for col in columns]
-                )
-                pk = "sys_id" if "sys_id" in columns else columns[0]
-                cursor.execute(
-                    f"IF OBJECT_ID('{table_name}', 'U') IS NULL CREATE TABLE {table_name} ({col_defs})"
-                )
-
-                # Upsert (MERGE para SQL Server)
-                for row in df.iter_rows(named=True):
-                    values = [
-                        row[col] if row[col] is not None else None
-                        for col in columns
-                    ]
-                    # Monta comando MERGE para upsert
-                    merge_sql = (
-                        f"MERGE INTO {table_name} AS target USING (SELECT "
-                    )
-                    merge_sql += ", ".join(
-                        [f"? AS [{col}]" for col in columns]
-                    )
-                    merge_sql += (
-                        f") AS source ON target.[{pk}] = source.[{pk}] "
-                    )
-                    merge_sql += "WHEN MATCHED THEN UPDATE SET "
-                    merge_sql += ", ".join(
-                        [
-                            f"target.[{col}] = source.[{col}]"
-                            for col in columns
-                            if col != pk
-                        ]
-                    )
-                    merge_sql += " WHEN NOT MATCHED THEN INSERT ("
-                    merge_sql += ", ".join([f"[{col}]" for col in columns])
-                    merge_sql += ") VALUES ("
-                    merge_sql += ", ".join(
-                        [f"source.[{col}]" for col in columns]
-                    )
-                    merge_sql += ");"
-                    try:
-                        cursor.execute(merge_sql, values)
-                        conn.commit()
-                    except Exception as row_error:
-                        print(
-                            f"Erro ao inserir linha na tabela {table_name}: {row_error}"
-                        )
-            conn.close()
+            with self.connection() as conn:
+                self._save_dataframes(conn, dataframes)
         except Exception as e:
             print(f"Erro ao salvar no banco: {e}")
             success = False
         return success
 
+    def _save_in_transaction(
+        self, dataframes: Dict[str, pl.DataFrame]
+    ) -> bool:
+        """Salva usando a conexão da transação aberta, sem commit"""
+        with self._transaction_lock:
+            try:
+                self._save_dataframes(
+                    self._transaction, dataframes, commit=False
+                )
+            except Exception as e:
+                print(f"Erro ao salvar no banco: {e}")
+                self._transaction_failed = True
+                return False
+        return True
+
+    def _save_dataframes(
+        self,
+        conn: pyodbc.Connection,
+        dataframes: Dict[str, pl.DataFrame],
+        commit: bool = True,
+    ):
+        """
+        Executa os upserts de todas as tabelas usando a conexão informada.
+
+        Com commit=True, qualquer erro desfaz o que já foi enviado antes de
+        ser propagado.
+        """
+        try:
+            self._upsert_dataframes(conn, dataframes)
+        except Exception:
+            if commit:
+                try:
+                    conn.rollback()
+                except pyodbc.Error:
+                    pass  # conexão perdida: será descartada pelo chamador
+            raise
+
+        if commit:
+            conn.commit()
+
+    def _upsert_dataframes(
+        self, conn: pyodbc.Connection, dataframes: Dict[str, pl.DataFrame]
+    ):
+        """Cria as tabelas ausentes e envia os MERGEs em lotes, sem commit"""
+        cursor = conn.cursor()
+        cursor.fast_executemany = True
+
+        # Ordem fixa (por nome) para que saves concorrentes travem as
+        # tabelas na mesma sequência e não entrem em deadlock; vazias são
+        # descartadas de saída
+        tables = sorted(
+            (
+                (table_name, df)
+                for table_name, df in dataframes.items()
+                if df is not None and not df.is_empty()
+            ),
+            key=lambda item: item[0],
+        )
+
+        for table_name, df in tables:
+            columns = df.columns
+            # Cria a tabela se não existir (schema simples, pode ser adaptado)
+
+            col_defs = ", ".join([f"[{col}] NVARCHAR(MAX)" for col in columns])
+            pk = "sys_id" if "sys_id" in columns else columns[0]
+            cursor.execute(
+                f"IF OBJECT_ID('{table_name}', 'U') IS NULL CREATE TABLE {table_name} ({col_defs})"
+            )
+
+            # Upsert (MERGE para SQL Server) - comando montado uma vez
+            merge_sql = self._build_merge_sql(table_name, columns, pk)
+
+            # Linhas como tuplas na ordem de df.columns, em lotes
+            for batch in df.iter_slices(n_rows=self.BATCH_ROWS):
+                self._execute_batch(
+                    cursor, merge_sql, table_name, batch.rows()
+                )
+
+    @contextmanager
+    def connection(self) -> Iterator[pyodbc.Connection]:
+        """
+        Empresta uma conexão do pool e a devolve ao final.
+
+        Conexões são criadas sob demanda, validadas com um ping antes do uso e
+        recriadas após POOL_RECYCLE_SECONDS. Em caso de erro a conexão é
+        descartada em vez de voltar ao pool.
+        """
+        conn, created_at = self._acquire()
+        try:
+            yield conn
+        except Exception:
+            self._discard(conn)
+            raise
+        else:
+            self._release(conn, created_at)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Agrupa todos os saves feitos dentro do bloco em um único commit.
+
+        Se algum save falhar ou uma exceção escapar do bloco, nada é gravado.
+        """
+        with self.connection() as conn:
+            self._transaction = conn
+            self._transaction_failed = False
+            try:
+                yield
+            except Exception:
+                conn.rollback()
+                raise
+            else:
+                if self._transaction_failed:
+                    print("↩️ Transação desfeita: houve falha ao salvar dados")
+                    conn.rollback()
+                else:
+                    conn.commit()
+            finally:
+                self._transaction = None
+
+    def close(self):
+        """Fecha todas as conexões mantidas no pool"""
+        while True:
+            try:
+                conn, _ = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def _acquire(self) -> Tuple[pyodbc.Connection, float]:
+        while True:
+            try:
+                conn, created_at = self._pool.get_nowait()
+            except queue.Empty:
+                break
+
+            if time.monotonic() - created_at > self.POOL_RECYCLE_SECONDS:
+                self._discard(conn)
+                continue
+
+            try:
+                conn.cursor().execute("SELECT 1").fetchone()
+                return conn, created_at
+            except pyodbc.Error:
+                self._discard(conn)
+
+        conn = pyodbc.connect(Config.get_db_connection_string())
+        return conn, time.monotonic()
+
+    def _release(self, conn: pyodbc.Connection, created_at: float):
+        try:
+            self._pool.put_nowait((conn, created_at))
+        except queue.Full:
+            self._discard(conn)
+
+    @staticmethod
+    def _discard(conn: pyodbc.Connection):
+        try:
+            conn.close()
+        except pyodbc.Error:
+            pass
+
+    @staticmethod
+    def _execute_batch(
+        cursor, merge_sql: str, table_name: str, rows: List[tuple]
+    ):
+        """
+        Executa um lote de upserts.
+
+        Se o lote falhar e a transação ainda estiver aberta, reprocessa linha
+        a linha para identificar as linhas com erro. Se o SQL Server já tiver
+        desfeito a transação (deadlock, XACT_ABORT, conexão perdida), os lotes
+        anteriores foram perdidos e o erro é propagado. Linhas com erro também
+        fazem o save falhar, para que nada seja confirmado pela metade.
+        """
+        try:
+            cursor.executemany(merge_sql, rows)
+        except Exception as batch_error:
+            try:
+                open_transactions = cursor.execute(
+                    "SELECT @@TRANCOUNT"
+                ).fetchone()[0]
+            except Exception:
+                open_transactions = 0
+
+            if not open_transactions:
+                print(
+                    f"❌ Erro no lote da tabela {table_name}; transação desfeita pelo servidor: {batch_error}"
+                )
+                raise
+
+            print(
+                f"⚠️ Erro no lote da tabela {table_name}, reprocessando linha a linha: {batch_error}"
+            )
+            # MERGE é idempotente, então reaplicar linhas já gravadas é seguro
+            failed_rows = 0
+            for values in rows:
+                try:
+                    cursor.execute(merge_sql, values)
+                except Exception as row_error:
+                    failed_rows += 1
+                    print(
+                        f"Erro ao inserir linha na tabela {table_name}: {row_error}"
+                    )
+
+            if failed_rows:
+                raise RuntimeError(
+                    f"{failed_rows} de {len(rows)} linhas da tabela "
+                    f"{table_name} falharam"
+                ) from batch_error
+
+    @staticmethod
+    def _build_merge_sql(table_name: str, columns: List[str], pk: str) -> str:
+        """Monta o comando MERGE parametrizado para upsert de uma linha"""
+        source_cols = ", ".join([f"? AS [{col}]" for col in columns])
+        update_set = ", ".join(
+            [
+                f"target.[{col}] = source.[{col}]"
+                for col in columns
+                if col != pk
+            ]
+        )
+        insert_cols = ", ".join([f"[{col}]" for col in columns])
+        insert_values = ", ".join([f"source.[{col}]" for col in columns])
+
+        return (
+            f"MERGE INTO {table_name} AS target USING (SELECT {source_cols}) "
+            f"AS source ON target.[{pk}] = source.[{pk}] "
+            f"WHEN MATCHED THEN UPDATE SET {update_set} "
+            f"WHEN NOT MATCHED THEN INSERT ({insert_cols}) "
+            f"VALUES ({insert_values});"
+        )
+
     def print_db_metrics(self):
-        print("🗄️  Métricas Banco de Dados: (implementação em desenvolvimento)")
+        print(
+            "🗄️  Métricas Banco de Dados: (implementação em desenvolvimento)"
+        )
 
     def get_db_metrics_data(self) -> Dict:
         """Retorna dados das métricas para uso externo"""
@@ -0,0 +1,93 @@
+"""
+Controle adaptativo de concorrência para requisições à API do ServiceNow
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List
+
+
+class AdaptiveFetcher:
+    """
+    Executa requisições em paralelo ajustando o número de requisições
+    simultâneas conforme a latência observada.
+
+    A cada WINDOW amostras o alvo cresce em STEP se o p95 estiver abaixo de
+    GROW_FACTOR x p50 e a taxa de erro abaixo de MAX_ERROR_RATE. Em caso de
+    HTTP 429 ou pico de latência (p95 acima de SPIKE_FACTOR x p50) o alvo é
+    reduzido pela metade.
+    """
+
+    WINDOW = 20
+    STEP = 2
+    GROW_FACTOR = 1.2
+    SPIKE_FACTOR = 2.0
+    MAX_ERROR_RATE = 0.01
+
+    def __init__(self, initial: int = 4, minimum: int = 2, maximum: int = 32):
+        self.target = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self._condition = threading.Condition()
+        self._inflight = 0
+        self._latencies: List[float] = []
+        self._errors = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=maximum, thread_name_prefix="servicenow-fetch"
+        )
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Agenda uma requisição, aguardando vaga se o alvo já foi atingido"""
+        with self._condition:
+            while self._inflight >= self.target:
+                self._condition.wait()
+            self._inflight += 1
+
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._release)
+        return future
+
+    def record(
+        self, latency: float, failed: bool = False, throttled: bool = False
+    ):
+        """Registra o resultado de uma requisição e ajusta o alvo"""
+        with self._condition:
+            if throttled:
+                self._shrink()
+                return
+
+            self._latencies.append(latency)
+            self._errors += int(failed)
+
+            if len(self._latencies) >= self.WINDOW:
+                self._adjust()
+
+    def _adjust(self):
+        """Recalcula o alvo com base na janela de latências atual"""
+        ordered = sorted(self._latencies)
+        p50 = ordered[len(ordered) // 2]
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        error_rate = self._errors / len(ordered)
+
+        if p95 > self.SPIKE_FACTOR * p50:
+            self._shrink()
+            return
+
+        if p95 < self.GROW_FACTOR * p50 and error_rate < self.MAX_ERROR_RATE:
+            self.target = min(self.maximum, self.target + self.STEP)
+            self._condition.notify_all()
+
+        self._reset_window()
+
+    def _shrink(self):
+        self.target = max(self.minimum, self.target // 2)
+        self._reset_window()
+
+    def _reset_window(self):
+        self._latencies = []
+        self._errors = 0
+
+    def _release(self, _future: Future):
+        with self._condition:
+            self._inflight -= 1
+            self._condition.notify_all()
@@ -3,87 +3,334 @@ Classe base para extração de dados do ServiceNow
 """
 
 import datetime
+import threading
 import time
-from time import sleep
-from typing import Any, Dict, List, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
+import orjson
 import polars as pl
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Importa configurações SSL (desabilita verificação SSL automaticamente)
 import ssl_config.ssl_config as ssl_config  # noqa: F401
 from settings.config import Config, flatten_reference_fields
 
+from .adaptive_fetcher import AdaptiveFetcher
+
+# Sessão HTTP compartilhada: mantém conexões TLS abertas entre requisições
+SESSION = requests.Session()
+SESSION.headers.update({"Accept-Encoding": "gzip", "Connection": "keep-alive"})
+# Repete falhas de conexão, 429 e 5xx com backoff exponencial (respeitando
+# Retry-After); esgotadas as tentativas, a última resposta é devolvida
+_adapter = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        raise_on_status=False,
+    ),
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
+
+class ApiMetrics:
+    """Contadores de performance da API de um extractor"""
+
+    __slots__ = ("total_requests", "total_api_time", "failed_requests")
+
+    def __init__(self):
+        self.total_requests = 0
+        self.total_api_time = 0.0
+        self.failed_requests = 0
+
+    def to_dict(self) -> dict:
+        """Retorna os contadores como dicionário"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ServiceNowRequestError(Exception):
+    """Requisição ao ServiceNow que falhou mesmo após as novas tentativas"""
+
 
 class BaseServiceNowExtractor:
     """Classe base para extração de dados do ServiceNow"""
 
+    # Controle de concorrência compartilhado por todos os extractors
+    fetcher = AdaptiveFetcher()
+
     def __init__(self):
         self.base_url = Config.SERVICENOW_BASE_URL
+        # Prefixo fixo da URL montado uma única vez; só o endpoint varia
+        self.url_template = f"{self.base_url}/%s"
         self.auth = Config.get_servicenow_auth()
         self.headers = Config.get_servicenow_headers()
-        self.api_metrics = {
-            "total_requests": 0,
-            "total_api_time": 0.0,
-            "failed_requests": 0,
-        }
+        self.metrics = ApiMetrics()
+        self._metrics_lock = threading.Lock()
 
     def make_request(
         self, endpoint: str, params: Dict[str, Any]
     ) -> List[Dict]:
-        """Faz uma requisição para a API do ServiceNow"""
-        url = f"{self.base_url}/{endpoint}"
+        """Faz uma requisição à API do ServiceNow ([] em caso de falha)"""
+        try:
+            return self._fetch_page(endpoint, params)[0]
+        except ServiceNowRequestError:
+            return []
+
+    def _fetch_page(
+        self, endpoint: str, params: Dict[str, Any]
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Faz a requisição e retorna (registros, X-Total-Count)
+
+        O total vem do header X-Total-Count do ServiceNow e é None quando
+        ausente. Falhas levantam ServiceNowRequestError, para não serem
+        confundidas com uma página vazia (fim dos resultados).
+        """
+        url = self.url_template % endpoint
 
-        start_time = time.time()
-        self.api_metrics["total_requests"] += 1
+        start_time = time.perf_counter()
 
         try:
-            response = requests.get(
+            response = SESSION.get(
                 url,
                 auth=self.auth,
                 headers=self.headers,
                 params=params,
+                timeout=Config.SERVICENOW_TIMEOUT,
                 verify=False,  # Desabilita verificação SSL
             )
             response.raise_for_status()
+            result = orjson.loads(response.content).get("result", [])
 
-            request_time = time.time() - start_time
-            self.api_metrics["total_api_time"] += request_time
+            request_time = time.perf_counter() - start_time
+            self._record_request(
+                request_time, throttled=self._was_throttled(response)
+            )
 
-            return response.json().get("result", [])
-        except requests.exceptions.RequestException as e:
-            request_time = time.time() - start_time
-            self.api_metrics["total_api_time"] += request_time
-            self.api_metrics["failed_requests"] += 1
+            total_count = response.headers.get("X-Total-Count")
+            return (
+                result,
+                int(total_count) if total_count is not None else None,
+            )
+        except (
+            requests.exceptions.RequestException,
+            orjson.JSONDecodeError,
+        ) as e:
+            request_time = time.perf_counter() - start_time
+            error_response = getattr(e, "response", None)
+            throttled = (
+                error_response is not None
+                and error_response.status_code == 429
+            )
+            self._record_request(
+                request_time, failed=True, throttled=throttled
+            )
             print(f"❌ Erro na requisição: {e}")
-            return []
+            raise ServiceNowRequestError(f"{endpoint}: {e}") from e
+
+    @staticmethod
+    def _was_throttled(response: requests.Response) -> bool:
+        """Indica se a requisição só passou depois de repetir um HTTP 429"""
+        retries = getattr(response.raw, "retries", None)
+        return retries is not None and any(
+            attempt.status == 429 for attempt in retries.history
+        )
+
+    def _record_request(
+        self,
+        request_time: float,
+        failed: bool = False,
+        throttled: bool = False,
+    ):
+        """Atualiza métricas da API e alimenta o controle de concorrência"""
+        with self._metrics_lock:
+            self.metrics.total_requests += 1
+            self.metrics.total_api_time += request_time
+            self.metrics.failed_requests += int(failed)
+
+        self.fetcher.record(request_time, failed=failed, throttled=throttled)
 
     def paginated_request(
-        self, endpoint: str, base_params: Dict[str, Any], limit: int = 10000
+        self,
+        endpoint: str,
+        base_params: Dict[str, Any],
+        limit: Optional[int] = None,
     ) -> List[Dict]:
         """Faz requisições paginadas para buscar todos os dados"""
         all_data = []
-        offset = 0
+        for result_page in self.iter_pages(endpoint, base_params, limit):
+            all_data.extend(result_page)
+        return all_data
+
+    def paginated_frame(
+        self,
+        endpoint: str,
+        base_params: Dict[str, Any],
+    ) -> pl.DataFrame:
+        """
+        Monta um DataFrame Polars página a página.
+
+        Cada página é processada e convertida em colunas assim que chega,
+        sem acumular todos os registros brutos em uma lista intermediária.
+        """
+        frames = [
+            pl.DataFrame(self.to_columns(self.process_data(result_page)))
+            for result_page in self.iter_pages(endpoint, base_params)
+        ]
 
-        while True:
+        if not frames:
+            return pl.DataFrame()
+        return pl.concat(frames, how="diagonal_relaxed")
+
+    def iter_pages(
+        self,
+        endpoint: str,
+        base_params: Dict[str, Any],
+        limit: Optional[int] = None,
+    ) -> Iterator[List[Dict]]:
+        """
+        Percorre as páginas de uma consulta, na ordem dos offsets
+
+        A paginação funciona como uma janela deslizante: os próximos offsets
+        já ficam em voo (até o alvo do controle adaptativo) enquanto a página
+        atual é processada. Quando o ServiceNow informa o X-Total-Count, só
+        são pedidos os offsets que existem; sem ele, continua especulando
+        enquanto as páginas vierem cheias.
+
+        O tamanho da página vem de Config.SERVICENOW_PAGE_SIZE e a consulta
+        é ordenada por sys_id para que os offsets sejam estáveis entre as
+        requisições paralelas.
+
+        Uma página que falhou, ou que veio vazia antes do X-Total-Count,
+        levanta ServiceNowRequestError em vez de encerrar a extração.
+        """
+        limit = limit or Config.SERVICENOW_PAGE_SIZE
+        base_params = {
+            **base_params,
+            "sysparm_query": self._ordered_query(
+                base_params.get("sysparm_query", "")
+            ),
+        }
+
+        pending = deque()
+        next_offset = 0
+        total_count = None
+
+        def submit_next_page():
+            nonlocal next_offset
             params = {
                 **base_params,
                 "sysparm_limit": limit,
-                "sysparm_offset": offset,
+                "sysparm_offset": next_offset,
             }
+            pending.append(
+                (
+                    next_offset,
+                    self.fetcher.submit(self._fetch_page, endpoint, params),
+                )
+            )
+            next_offset += limit
 
-            result_page = self.make_request(endpoint, params)
+        submit_next_page()
 
-            if not result_page:
-                print("✅ Fim dos resultados.")
-                break
+        try:
+            while pending:
+                offset, future = pending.popleft()
+                result_page, page_total = future.result()
 
-            all_data.extend(result_page)
-            print(f"📦 Página lida com sucesso: +{len(result_page)} registros")
-            offset += limit
+                if page_total is not None:
+                    total_count = page_total
+
+                if not result_page:
+                    if total_count is not None and offset < total_count:
+                        raise ServiceNowRequestError(
+                            f"{endpoint}: página vazia no offset {offset} "
+                            f"de {total_count} registros"
+                        )
+                    print("✅ Fim dos resultados.")
+                    break
+
+                # Agenda as próximas páginas antes de processar a atual
+                if total_count is not None:
+                    while (
+                        len(pending) < self.fetcher.target
+                        and next_offset < total_count
+                    ):
+                        submit_next_page()
+                elif len(result_page) == limit:
+                    while len(pending) < self.fetcher.target:
+                        submit_next_page()
+                elif not pending:
+                    submit_next_page()
+
+                print(
+                    f"📦 Página lida com sucesso: +{len(result_page)} registros"
+                )
+                yield result_page
+        finally:
+            # Offsets especulativos além do fim não são mais necessários
+            for _, future in pending:
+                future.cancel()
+
+    @staticmethod
+    def _ordered_query(query: str) -> str:
+        """Garante uma ordenação determinística (ORDERBYsys_id) na consulta"""
+        if "ORDERBY" in query:
+            return query
+        return f"{query}^ORDERBYsys_id" if query else "ORDERBYsys_id"
+
+    def request_by_ids(
+        self,
+        endpoint: str,
+        ids: Iterable[str],
+        base_params: Dict[str, Any],
+        field: str = "sys_id",
+        batch_size: int = 200,
+        max_workers: int = 8,
+    ) -> List[Dict]:
+        """
+        Busca registros por uma lista de IDs usando o operador IN do ServiceNow
+
+        Os IDs são enviados em lotes de `batch_size` por consulta
+        (`campoINid1,id2,...`), uma requisição por lote em vez de uma por ID.
+        Até `max_workers` lotes são consultados em paralelo; as páginas de
+        cada lote continuam limitadas pelo controle adaptativo.
+        """
+        all_data = []
+        ids_list = list(ids)
+        batches = [
+            ids_list[i : i + batch_size]
+            for i in range(0, len(ids_list), batch_size)
+        ]
+
+        def fetch_batch(batch_ids: List[str]) -> List[Dict]:
+            params = {
+                **base_params,
+                "sysparm_query": f"{field}IN{','.join(batch_ids)}",
+            }
+            return self.paginated_request(endpoint, params)
 
-            # Evita overload na API
-            sleep(0.2)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for number, batch_data in enumerate(
+                executor.map(fetch_batch, batches), start=1
+            ):
+                all_data.extend(batch_data)
+                print(f"📥 Lote {number}: {len(batch_data)} registros")
 
         return all_data
 
@@ -100,6 +347,39 @@ class BaseServiceNowExtractor:
 
         return processed_data
 
+    @staticmethod
+    def to_columns(
+        records: List[Dict], fields: Optional[Iterable[str]] = None
+    ) -> Dict[str, list]:
+        """
+        Converte registros em colunas (dict de listas) para montar o DataFrame.
+
+        Sem fields, usa a união das chaves na ordem em que aparecem, já que
+        process_data só cria os campos dv_* para referências preenchidas.
+        """
+        if fields is None:
+            fields = dict.fromkeys(key for record in records for key in record)
+        return {
+            field: [record.get(field) for record in records]
+            for field in fields
+        }
+
+    @staticmethod
+    def add_etl_timestamps(df: pl.DataFrame) -> pl.DataFrame:
+        """
+        Adiciona etl_created_at e etl_updated_at ao DataFrame.
+
+        Usa um único datetime.now() como literal, em vez de gravar o mesmo
+        valor registro a registro.
+        """
+        if df.is_empty():
+            return df
+
+        now = pl.lit(datetime.datetime.now())
+        return df.with_columns(
+            now.alias("etl_created_at"), now.alias("etl_updated_at")
+        )
+
     def get_date_range(
         self, start_date: Optional[str] = None, end_date: Optional[str] = None
     ) -> tuple:
@@ -115,24 +395,22 @@ class BaseServiceNowExtractor:
 
     def get_api_metrics(self) -> dict:
         """Retorna métricas de performance da API"""
-        return self.api_metrics.copy()
+        return self.metrics.to_dict()
 
     def print_api_metrics(self, extractor_name: str = ""):
         """Imprime métricas de performance da API"""
-        metrics = self.api_metrics
-        avg_time = metrics["total_api_time"] / max(
-            metrics["total_requests"], 1
-        )
+        metrics = self.metrics
+        avg_time = metrics.total_api_time / max(metrics.total_requests, 1)
         success_rate = (
-            (metrics["total_requests"] - metrics["failed_requests"])
-            / max(metrics["total_requests"], 1)
+            (metrics.total_requests - metrics.failed_requests)
+            / max(metrics.total_requests, 1)
         ) * 100
 
         print(f"\n📊 Métricas API {extractor_name}:")
-        print(f"   ├── Total de requisições: {metrics['total_requests']}")
-        print(f"   ├── Requisições falharam: {metrics['failed_requests']}")
+        print(f"   ├── Total de requisições: {metrics.total_requests}")
+        print(f"   ├── Requisições falharam: {metrics.failed_requests}")
         print(f"   ├── Taxa de sucesso: {success_rate:.1f}%")
-        print(f"   ├── Tempo total API: {metrics['total_api_time']:.2f}s")
+        print(f"   ├── Tempo total API: {metrics.total_api_time:.2f}s")
         print(f"   └── Tempo médio por requisição: {avg_time:.3f}s")
 
     def extract_data(self, *args, **kwargs) -> pl.DataFrame:
@@ -2,9 +2,8 @@
 Extrator de empresas do ServiceNow com sincronização incremental
 """
 
-import hashlib
 from datetime import datetime, timedelta
-from typing import List, Set
+from typing import Dict, List, Set
 
 import polars as pl
 
@@ -12,6 +11,47 @@ from settings.config import get_db_connection
 
 from .base_extractor import BaseServiceNowExtractor
 
+# Campos extraídos da API de empresas
+_COMPANY_FIELDS = (
+    # Campos básicos
+    "sys_id",
+    "name",
+    "parent",
+    # Tipos de empresa
+    "customer",
+    "vendor",
+    "manufacturer",
+    # Contato
+    "phone",
+    "fax",
+    "website",
+    # Endereço
+    "street",
+    "city",
+    "state",
+    "zip",
+    "country",
+    # Fiscal
+    "federal_tax_id",
+    # Status
+    "active",
+    # Auditoria
+    "sys_created_on",
+    "sys_created_by",
+    "sys_updated_on",
+    "sys_updated_by",
+)
+_COMPANY_FIELDS_CSV = ",".join(_COMPANY_FIELDS)
+
+# Colunas usadas no etl_hash, em ordem fixa (sem as datas sys_*_on)
+_HASH_COLUMNS = tuple(
+    sorted(set(_COMPANY_FIELDS) - {"sys_created_on", "sys_updated_on"})
+)
+
+# Campos booleanos gravados como 0/1 e valores considerados verdadeiros
+_BOOL_FIELDS = ("customer", "vendor", "manufacturer", "active")
+_TRUTHY = frozenset({True, "true", "1", "True", "TRUE"})
+
 
 class CompanyExtractor(BaseServiceNowExtractor):
     """Extrator específico para empresas (sys_company/core_company) com sincronização inteligente"""
@@ -43,49 +83,27 @@ class CompanyExtractor(BaseServiceNowExtractor):
         """Extrai todas as empresas (sincronização completa)"""
         print("📥 Buscando todas as empresas...")
 
-        # Busca todas as empresas ativas primeiro
-        params = {
-            "sysparm_query": "active=true",
-            "sysparm_fields": self._get_company_fields(),
-        }
-
-        active_companies = self.paginated_request(self.api_endpoint, params)
-        print(f"✅ {len(active_companies)} empresas ativas encontradas")
-
-        # Busca também empresas inativas modificadas recentemente (últimos 30 dias)
+        # Empresas ativas + inativas modificadas recentemente (últimos 30
+        # dias) em uma única consulta, avaliada pelo próprio ServiceNow
         cutoff_date = (datetime.now() - timedelta(days=30)).strftime(
             "%Y-%m-%d %H:%M:%S"
         )
-        params_inactive = {
-            "sysparm_query": f"active=false^sys_updated_on>={cutoff_date}",
+        params = {
+            "sysparm_query": f"active=true^ORsys_updated_on>={cutoff_date}",
             "sysparm_fields": self._get_company_fields(),
         }
 
-        inactive_companies = self.paginated_request(
-            self.api_endpoint, params_inactive
-        )
-        print(
-            f"✅ {len(inactive_companies)} empresas inativas modificadas recentemente"
-        )
-
-        # Combina todas as empresas
-        all_companies = active_companies + inactive_companies
-
-        # Remove duplicatas baseado no sys_id
-        seen_ids = set()
-        unique_companies = []
-        for company in all_companies:
-            if company.get("sys_id") not in seen_ids:
-                unique_companies.append(company)
-                seen_ids.add(company.get("sys_id"))
+        companies = self.paginated_request(self.api_endpoint, params)
 
-        print(f"✅ Total de {len(unique_companies)} empresas únicas extraídas")
+        # Paginação por offset pode repetir registros alterados durante a
+        # leitura; mantém a última versão de cada sys_id
+        companies = list(
+            {company.get("sys_id"): company for company in companies}.values()
+        )
+        print(f"✅ Total de {len(companies)} empresas únicas extraídas")
 
-        if unique_companies:
-            processed_companies = self._process_and_hash_companies(
-                unique_companies
-            )
-            return pl.DataFrame(processed_companies)
+        if companies:
+            return self._process_and_hash_companies(companies)
         else:
             return pl.DataFrame()
 
@@ -109,134 +127,178 @@ class CompanyExtractor(BaseServiceNowExtractor):
             f"✅ {len(modified_companies)} empresas modificadas desde {last_sync_date}"
         )
 
+        # 3. Descarta as que já foram gravadas com o mesmo sys_updated_on
+        modified_companies = self._drop_already_synced(modified_companies)
+
         if modified_companies:
             processed_companies = self._process_and_hash_companies(
                 modified_companies
             )
 
-            # 3. Identifica quais realmente mudaram (usando hash)
+            # 4. Identifica quais realmente mudaram (usando hash)
             companies_to_update = self._filter_changed_companies(
                 processed_companies
             )
             print(
-                f"🔄 {len(companies_to_update)} empresas com mudanças reais detectadas"
+                f"🔄 {companies_to_update.height} empresas com mudanças reais detectadas"
             )
 
-            if companies_to_update:
-                return pl.DataFrame(companies_to_update)
+            if not companies_to_update.is_empty():
+                return companies_to_update
 
         print("ℹ️ Nenhuma mudança detectada nas empresas")
         return pl.DataFrame()
 
     def _get_company_fields(self) -> str:
         """Define campos a serem extraídos da API de empresas"""
-        fields = [
-            # Campos básicos
-            "sys_id",
-            "name",
-            "parent",
-            # Tipos de empresa
-            "customer",
-            "vendor",
-            "manufacturer",
-            # Contato
-            "phone",
-            "fax",
-            "website",
-            # Endereço
-            "street",
-            "city",
-            "state",
-            "zip",
-            "country",
-            # Fiscal
-            "federal_tax_id",
-            # Status
-            "active",
-            # Auditoria
-            "sys_created_on",
-            "sys_created_by",
-            "sys_updated_on",
-            "sys_updated_by",
-        ]
+        return _COMPANY_FIELDS_CSV
 
-        return ",".join(fields)
+    def _process_and_hash_companies(
+        self, companies: List[dict]
+    ) -> pl.DataFrame:
+        """
+        Processa empresas e adiciona hash para controle de mudanças
 
-    def _process_and_hash_companies(self, companies: List[dict]) -> List[dict]:
-        """Processa empresas e adiciona hash para controle de mudanças"""
-        processed_companies = []
+        O hash (etl_hash) é calculado de forma vetorizada pelo Polars sobre
+        as colunas de dados em ordem fixa, sem md5 linha a linha.
+        """
+        processed_companies = self.process_data(companies)
 
-        for company in companies:
-            # Processa campos de referência
-            processed_company = self.process_data([company])[0]
+        # Mesmo timestamp ETL para todo o lote
+        now = datetime.now()
 
+        for processed_company in processed_companies:
             # Converte campos booleanos para formato do banco
-            bool_fields = ["customer", "vendor", "manufacturer", "active"]
-            for field in bool_fields:
+            for field in _BOOL_FIELDS:
                 if field in processed_company:
                     processed_company[field] = (
-                        1
-                        if processed_company[field] in [True, "true", "1"]
-                        else 0
+                        1 if processed_company[field] in _TRUTHY else 0
                     )
 
             # Adiciona timestamps ETL
-            processed_company["etl_created_at"] = datetime.now()
-            processed_company["etl_updated_at"] = datetime.now()
-
-            # Calcula hash dos dados principais
-            hash_data = {
-                k: v
-                for k, v in processed_company.items()
-                if not k.startswith("etl_")
-                and k not in ["sys_created_on", "sys_updated_on"]
-            }
+            processed_company["etl_created_at"] = now
+            processed_company["etl_updated_at"] = now
 
-            data_string = str(sorted(hash_data.items()))
-            processed_company["etl_hash"] = hashlib.md5(
-                data_string.encode()
-            ).hexdigest()
+        df = pl.DataFrame(processed_companies)
 
-            processed_companies.append(processed_company)
+        # Calcula hash dos dados principais
+        hash_columns = [
+            column for column in _HASH_COLUMNS if column in df.columns
+        ]
 
-        return processed_companies
+        return df.with_columns(
+            etl_hash=pl.concat_str(
+                [
+                    pl.col(column).cast(pl.Utf8).fill_null("")
+                    for column in hash_columns
+                ],
+                separator="\x1f",
+            )
+            .hash()
+            .reinterpret(signed=True)  # BIGINT no SQL Server
+        )
 
-    def _filter_changed_companies(self, companies: List[dict]) -> List[dict]:
-        """Filtra apenas empresas que realmente mudaram (baseado no hash)"""
+    def _drop_already_synced(self, companies: List[dict]) -> List[dict]:
+        """
+        Remove empresas cujo sys_updated_on é igual ao já gravado no banco,
+        antes de gastar tempo com processamento e hash
+        """
         if not companies:
-            return []
-
-        changed_companies = []
+            return companies
 
         try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
+            known = self._get_existing_values(
+                "sys_updated_on", [company["sys_id"] for company in companies]
+            )
+        except Exception as e:
+            print(f"⚠️ Erro ao consultar sincronização anterior: {e}")
+            return companies
 
-                for company in companies:
-                    # Busca hash atual no banco
-                    query = "SELECT etl_hash FROM sys_company WHERE sys_id = ?"
-                    cursor.execute(query, company["sys_id"])
-                    result = cursor.fetchone()
-
-                    if result is None:
-                        # Empresa nova
-                        print(
-                            f"➕ Nova empresa: {company.get('name', company.get('sys_id'))}"
-                        )
-                        changed_companies.append(company)
-                    elif result[0] != company["etl_hash"]:
-                        # Empresa modificada
-                        print(
-                            f"🔄 Empresa modificada: {company.get('name', company.get('sys_id'))}"
-                        )
-                        changed_companies.append(company)
+        # DATETIME2 volta como datetime; compara no formato da API
+        synced = {
+            sys_id: str(updated_on)[:19]
+            for sys_id, updated_on in known.items()
+            if updated_on is not None
+        }
+
+        candidates = [
+            company
+            for company in companies
+            if synced.get(company["sys_id"]) != company.get("sys_updated_on")
+        ]
+        print(
+            f"⏭️ {len(companies) - len(candidates)} empresas sem alteração "
+            "desde a última carga"
+        )
+
+        return candidates
+
+    def _filter_changed_companies(
+        self, companies: pl.DataFrame
+    ) -> pl.DataFrame:
+        """Filtra apenas empresas que realmente mudaram (baseado no hash)"""
+        if companies.is_empty():
+            return companies
 
+        try:
+            existing_hashes = self._get_existing_values(
+                "etl_hash", companies["sys_id"].to_list()
+            )
         except Exception as e:
             print(f"⚠️ Erro ao filtrar empresas alteradas: {e}")
             print("ℹ️ Retornando todas as empresas por segurança")
             return companies
 
-        return changed_companies
+        existing_df = pl.DataFrame(
+            {
+                "sys_id": list(existing_hashes.keys()),
+                "db_hash": list(existing_hashes.values()),
+            },
+            schema={"sys_id": pl.Utf8, "db_hash": pl.Int64},
+        )
+
+        # Novas (sem hash no banco) ou modificadas (hash diferente)
+        changed_companies = companies.join(
+            existing_df, on="sys_id", how="left"
+        ).filter(
+            pl.col("db_hash").is_null()
+            | (pl.col("db_hash") != pl.col("etl_hash"))
+        )
+        new_count = changed_companies["db_hash"].null_count()
+
+        print(
+            f"➕ {new_count} empresas novas | "
+            f"🔄 {changed_companies.height - new_count} empresas modificadas"
+        )
+
+        return changed_companies.drop("db_hash")
+
+    def _get_existing_values(
+        self, column: str, sys_ids: List[str], chunk_size: int = 1000
+    ) -> Dict[str, object]:
+        """
+        Busca `column` das empresas já gravadas em sys_company
+
+        Os sys_ids são consultados em lotes de `chunk_size` com
+        `WHERE sys_id IN (...)` (limite de parâmetros do SQL Server), em uma
+        única conexão. Retorna {sys_id: valor} apenas das empresas existentes.
+        """
+        existing = {}
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            for i in range(0, len(sys_ids), chunk_size):
+                chunk = sys_ids[i : i + chunk_size]
+                placeholders = ",".join("?" * len(chunk))
+                query = (
+                    f"SELECT sys_id, {column} FROM sys_company "
+                    f"WHERE sys_id IN ({placeholders})"
+                )
+                cursor.execute(query, chunk)
+                existing.update({row[0]: row[1] for row in cursor.fetchall()})
+
+        return existing
 
     def _get_last_sync_date(self) -> str:
         """Obtém data da última sincronização de empresas"""
@@ -276,35 +338,19 @@ class CompanyExtractor(BaseServiceNowExtractor):
 
         print(f"🔍 Buscando {len(company_ids)} empresas específicas por ID...")
 
-        # Divide em lotes para evitar URLs muito longas
-        batch_size = 50
-        all_companies = []
-
-        company_ids_list = list(company_ids)
-        for i in range(0, len(company_ids_list), batch_size):
-            batch_ids = company_ids_list[i : i + batch_size]
-            ids_query = "^OR".join([f"sys_id={cid}" for cid in batch_ids])
-
-            params = {
-                "sysparm_query": ids_query,
-                "sysparm_fields": self._get_company_fields(),
-            }
-
-            batch_companies = self.paginated_request(self.api_endpoint, params)
-            all_companies.extend(batch_companies)
-            print(
-                f"📥 Lote {i // batch_size + 1}: {len(batch_companies)} empresas"
-            )
+        # Consulta "sys_idIN..." em lotes para evitar URLs muito longas
+        all_companies = self.request_by_ids(
+            self.api_endpoint,
+            company_ids,
+            {"sysparm_fields": self._get_company_fields()},
+        )
 
         print(
             f"✅ Total de {len(all_companies)} empresas específicas extraídas"
         )
 
         if all_companies:
-            processed_companies = self._process_and_hash_companies(
-                all_companies
-            )
-            return pl.DataFrame(processed_companies)
+            return self._process_and_hash_companies(all_companies)
         else:
             return pl.DataFrame()
 
@@ -318,17 +364,15 @@ class CompanyExtractor(BaseServiceNowExtractor):
 
                 # Busca IDs únicos de empresas referenciadas em incidentes
                 query = """
-                SELECT DISTINCT company
-                FROM incident 
-                WHERE company IS NOT NULL 
-                AND company NOT IN (SELECT sys_id FROM sys_company)
+                SELECT DISTINCT i.company
+                FROM incident i
+                LEFT JOIN sys_company c ON c.sys_id = i.company
+                WHERE i.company IS NOT NULL
+                AND c.sys_id IS NULL
                 """
 
                 cursor.execute(query)
-                results = cursor.fetchall()
-
-                for row in results:
-                    missing_ids.add(row[0])
+                missing_ids = {row[0] for row in cursor.fetchall()}
 
                 print(
                     f"🔍 {len(missing_ids)} empresas referenciadas mas não encontradas na tabela"
@@ -373,7 +417,6 @@ class CompanyExtractor(BaseServiceNowExtractor):
         )
 
         if companies:
-            processed_companies = self._process_and_hash_companies(companies)
-            return pl.DataFrame(processed_companies)
+            return self._process_and_hash_companies(companies)
         else:
             return pl.DataFrame()
@@ -2,27 +2,31 @@
 Extrator de tarefas de incidentes do ServiceNow
 """
 
-from datetime import datetime
 from typing import Optional
 
 import polars as pl
 
 from .base_extractor import BaseServiceNowExtractor
 
+# Tarefas abertas no período: (data inicial, data final)
+_QUERY_TEMPLATE = (
+    "opened_at>=%s 00:00:00^opened_at<=%s 23:59:59^parentISNOTEMPTY"
+)
+
 
 class TaskExtractor(BaseServiceNowExtractor):
     """Extrator específico para tarefas de incidentes"""
 
-    def get_tasks_for_incidents(self, start_date: str, end_date: str) -> list:
-        """Busca tarefas para uma lista de incidentes"""
-        all_tasks = []
-
-        query = f"opened_at>={start_date} 00:00:00^opened_at<={end_date} 23:59:59^parentISNOTEMPTY"
+    def get_tasks_for_incidents(
+        self, start_date: str, end_date: str
+    ) -> pl.DataFrame:
+        """Busca e processa as tarefas do período, página a página"""
+        query = _QUERY_TEMPLATE % (start_date, end_date)
         params = {"sysparm_query": query}
 
-        tasks = self.paginated_request("incident_task", params)
-        all_tasks.extend(tasks)
-        return all_tasks
+        return self.add_etl_timestamps(
+            self.paginated_frame("incident_task", params)
+        )
 
     def extract_data(
         self,
@@ -32,24 +36,7 @@ class TaskExtractor(BaseServiceNowExtractor):
         """Extrai dados de tarefas para os incidentes especificados e retorna como DataFrame Polars"""
         print(f"📅 Processando tarefas")
 
-        # Busca tarefas
-        tasks = self.get_tasks_for_incidents(start_date, end_date)
-        print(f"✅ Total de {len(tasks)} tarefas extraídas")
-        if tasks:
-            # Enriquece os dados
-            tasks = self._process_tasks(tasks=tasks)
-            return pl.DataFrame(data=tasks)
-        else:
-            return pl.DataFrame()
-
-    def _process_tasks(self, tasks: list) -> list:
-        """Processa dados básicos dos incidentes sem enriquecimento"""
-        processed_tasks = []
-
-        for tasks in tasks:
-            processed_task = self.process_data([tasks])[0]
-            processed_task["etl_created_at"] = datetime.now()
-            processed_task["etl_updated_at"] = datetime.now()
-            processed_tasks.append(processed_task)
-
-        return processed_tasks
+        # Busca e processa as tarefas
+        df = self.get_tasks_for_incidents(start_date, end_date)
+        print(f"✅ Total de {df.height} tarefas extraídas")
+        return df
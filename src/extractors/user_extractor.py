@@ -268,25 +268,12 @@ class UserExtractor(BaseServiceNowExtractor):
 
         print(f"🔍 Buscando {len(user_ids)} usuários específicos por ID...")
 
-        # Divide em lotes para evitar URLs muito longas
-        batch_size = 50
-        all_users = []
-
-        user_ids_list = list(user_ids)
-        for i in range(0, len(user_ids_list), batch_size):
-            batch_ids = user_ids_list[i : i + batch_size]
-            ids_query = "^OR".join([f"sys_id={uid}" for uid in batch_ids])
-
-            params = {
-                "sysparm_query": ids_query,
-                "sysparm_fields": self._get_user_fields(),
-            }
-
-            batch_users = self.paginated_request(self.api_endpoint, params)
-            all_users.extend(batch_users)
-            print(
-                f"📥 Lote {i // batch_size + 1}: {len(batch_users)} usuários"
-            )
+        # Consulta "sys_idIN..." em lotes para evitar URLs muito longas
+        all_users = self.request_by_ids(
+            self.api_endpoint,
+            user_ids,
+            {"sysparm_fields": self._get_user_fields()},
+        )
 
         print(f"✅ Total de {len(all_users)} usuários específicos extraídos")
 
@@ -0,0 +1,30 @@
+"""
+Configuração de logging do ServiceNow ETL
+"""
+
+import logging
+import sys
+
+LOGGER_NAME = "servicenow_etl"
+
+
+def get_etl_logger(level: int = logging.INFO) -> logging.Logger:
+    """
+    Retorna o logger do ETL.
+
+    Na primeira chamada configura um StreamHandler no stdout. A escrita é
+    síncrona de propósito: extractors, DatabaseManager e demais módulos
+    ainda usam print, e um handler em fila (QueueListener) escreveria as
+    mensagens do logger depois delas, fora de ordem no console.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+
+        logger.addHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = False
+
+    return logger
@@ -79,18 +79,14 @@ class ExecutionLogger:
         json_str = " + JSON" if json_enabled else ""
         print(f"🎯 Execução: {execution_type.upper()}{period_str}{json_str}")
 
-    def update_api_metrics(self, extractors: List[Any]):
-        """Atualiza métricas da API baseado nos extractors"""
-        total_requests = 0
-        failed_requests = 0
-        total_api_time = 0.0
-
-        for extractor in extractors:
-            if hasattr(extractor, "get_api_metrics"):
-                metrics = extractor.get_api_metrics()
-                total_requests += metrics.get("total_requests", 0)
-                failed_requests += metrics.get("failed_requests", 0)
-                total_api_time += metrics.get("total_api_time", 0.0)
+    def update_api_metrics(self, metrics_df: Any):
+        """
+        Atualiza métricas da API a partir do DataFrame Polars com uma linha
+        por extractor (colunas de ApiMetrics)
+        """
+        total_requests = metrics_df["total_requests"].sum()
+        failed_requests = metrics_df["failed_requests"].sum()
+        total_api_time = metrics_df["total_api_time"].sum()
 
         success_rate = 0.0
         if total_requests > 0:
@@ -152,6 +148,11 @@ class ExecutionLogger:
 
         self.execution_data["records_by_table"][table_name] = record_count
 
+    def add_processed_tables(self, record_counts: Dict[str, int]):
+        """Adiciona várias tabelas processadas ao log de uma vez"""
+        for table_name, record_count in record_counts.items():
+            self.add_processed_table(table_name, record_count)
+
     def set_error(self, error_message: str):
         """Define erro na execução"""
         self.execution_data["status"] = "failed"
@@ -193,7 +194,7 @@ class ExecutionLogger:
                 tables_processed_str = ",".join(
                     self.execution_data["tables_processed"]
                 )
-                records_by_table_json = teste_json.dumps(
+                records_by_table_json = json.dumps(
                     self.execution_data["records_by_table"]
                 )
 
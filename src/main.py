@@ -5,36 +5,44 @@ Script principal para execução da extração e carga de dados do ServiceNow -
 import datetime
 import sys
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional
 
-from analyzer.storage_analyzer import StorageAnalyzer
-from data_base.database_manager import DatabaseManager
-from extractors.company_extractor import CompanyExtractor
-from extractors.contract_group_extractor import (
-    ContractSLAExtractor,
-    GroupExtractor,
-)
-from extractors.incident_extractor import IncidentExtractor
-from extractors.sla_extractor import SLAExtractor
-from extractors.task_extractor import TaskExtractor
-from extractors.time_worked_extractor import TimeWorkedExtractor
-from extractors.user_extractor import UserExtractor
+from log.etl_logging import get_etl_logger
 from log.execution_logger import ExecutionLogger, print_recent_executions
-from teste_json.json_data_manager import JSONDataManager
 
 
 class ServiceNowETL:
     """Classe principal para orquestrar o processo ETL do ServiceNow"""
 
+    # Abaixo deste total de registros o armazenamento JSON não compensa
+    MIN_JSON_ROWS = 10
+
     def __init__(
         self,
         enable_json_storage: bool = True,
         logger: Optional["ExecutionLogger"] = None,
     ):
+        # Importados aqui para que comandos como help e logs não carreguem
+        # Polars, pyodbc e os extractors
+        from data_base.database_manager import DatabaseManager
+        from extractors.company_extractor import CompanyExtractor
+        from extractors.contract_group_extractor import (
+            ContractSLAExtractor,
+            GroupExtractor,
+        )
+        from extractors.incident_extractor import IncidentExtractor
+        from extractors.sla_extractor import SLAExtractor
+        from extractors.task_extractor import TaskExtractor
+        from extractors.time_worked_extractor import TimeWorkedExtractor
+        from extractors.user_extractor import UserExtractor
+        from teste_json.json_data_manager import JSONDataManager
+
         self.db_manager = DatabaseManager()
         self.json_manager = JSONDataManager()
         self.enable_json_storage = True
         self.logger = logger
+        self.log = get_etl_logger()
         self.incident_extractor = IncidentExtractor()
         self.task_extractor = TaskExtractor()
         self.sla_extractor = SLAExtractor()
@@ -46,12 +54,32 @@ class ServiceNowETL:
 
     def extract_configuration_data(self):
         """Extrai dados de configuração (contratos SLA e grupos)"""
-        print("🔧 Iniciando extração de dados de configuração...")
-        start_time = time.time()
-        contract_df = self.contract_extractor.extract_data()
-        groups_df = self.group_extractor.extract_data()
-        users_df = self.user_extractor.extract_data()
-        companys_df = self.company_extractor.extract_data()
+        return self._save_configuration_frames(
+            self._extract_configuration_frames()
+        )
+
+    def _extract_configuration_frames(self) -> dict:
+        """Extrai os dados de configuração da API, sem gravar no banco"""
+        self.log.info("🔧 Iniciando extração de dados de configuração...")
+        start_ns = time.perf_counter_ns()
+
+        # Endpoints independentes: extrai em paralelo
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            contract_future = executor.submit(
+                self.contract_extractor.extract_data
+            )
+            groups_future = executor.submit(self.group_extractor.extract_data)
+            users_future = executor.submit(self.user_extractor.extract_data)
+            companys_future = executor.submit(
+                self.company_extractor.extract_data
+            )
+
+            config_dataframes = {
+                "contract_sla": contract_future.result(),
+                "groups": groups_future.result(),
+                "users": users_future.result(),
+                "companys": companys_future.result(),
+            }
 
         # Imprime métricas da API
         self.contract_extractor.print_api_metrics("Contratos SLA")
@@ -59,37 +87,34 @@ class ServiceNowETL:
         self.user_extractor.print_api_metrics("Users")
         self.company_extractor.print_api_metrics("Company")
 
-        # Salva no banco
-        config_dataframes = {
-            "contract_sla": contract_df,
-            "groups": groups_df,
-            "users": users_df,
-            "companys": companys_df,
-        }
+        api_time = (time.perf_counter_ns() - start_ns) / 1e9
+        self.log.info(f"\n⏱️  Tempo configuração - API: {api_time:.2f}s")
 
-        db_start_time = time.time()
+        return config_dataframes
+
+    def _save_configuration_frames(self, config_dataframes: dict) -> bool:
+        """Grava os dados de configuração no banco"""
+        db_start_ns = time.perf_counter_ns()
         success = self.db_manager.save_dataframes_to_database(
             config_dataframes
         )
-
-        db_end_time = time.time()
+        db_time = (time.perf_counter_ns() - db_start_ns) / 1e9
 
         # Atualiza logger se disponível
         if self.logger:
-            self.logger.add_processed_table("contract_sla", len(contract_df))
-            self.logger.add_processed_table("groups", len(groups_df))
-
-        total_time = time.time() - start_time
-        db_time = db_end_time - db_start_time
+            self.logger.add_processed_tables(
+                {
+                    "contract_sla": config_dataframes["contract_sla"].height,
+                    "groups": config_dataframes["groups"].height,
+                }
+            )
 
-        print(
-            f"\n⏱️  Tempo configuração - Total: {total_time:.2f}s | BD: {db_time:.2f}s"
-        )
+        self.log.info(f"⏱️  Tempo configuração - BD: {db_time:.2f}s")
 
         if success:
-            print("✅ Dados de configuração salvos com sucesso")
+            self.log.info("✅ Dados de configuração salvos com sucesso")
         else:
-            print("❌ Erro ao salvar dados de configuração")
+            self.log.error("❌ Erro ao salvar dados de configuração")
 
         return success
 
@@ -97,8 +122,27 @@ class ServiceNowETL:
         self, start_date: Optional[str] = None, end_date: Optional[str] = None
     ):
         """Extrai dados de incidentes e dados relacionados"""
-        print("📊 Iniciando extração de dados de incidentes...")
-        start_time = time.time()
+        incident_dataframes = self._extract_incident_frames(
+            start_date, end_date
+        )
+        if not incident_dataframes:
+            return True
+
+        success = self._save_incident_frames(incident_dataframes)
+        if success:
+            self._save_incident_json(incident_dataframes, start_date, end_date)
+        return success
+
+    def _extract_incident_frames(
+        self, start_date: Optional[str] = None, end_date: Optional[str] = None
+    ) -> dict:
+        """
+        Extrai incidentes e dados relacionados da API, sem gravar no banco.
+
+        Retorna um dicionário vazio quando não há incidentes no período.
+        """
+        self.log.info("📊 Iniciando extração de dados de incidentes...")
+        start_ns = time.perf_counter_ns()
 
         # 1. Extrai incidentes
         incidents_df = self.incident_extractor.extract_data(
@@ -106,19 +150,28 @@ class ServiceNowETL:
         )
 
         if incidents_df.is_empty():
-            print("⚠️  Nenhum incidente encontrado para o período especificado")
-            return True
+            self.log.warning(
+                "⚠️  Nenhum incidente encontrado para o período especificado"
+            )
+            return {}
 
-        # 3. Extrai dados relacionados
-        print("🔗 Extraindo dados relacionados aos incidentes...")
+        # 2. Extrai dados relacionados (consultas independentes, em paralelo)
+        self.log.info("🔗 Extraindo dados relacionados aos incidentes...")
 
-        tasks_df = self.task_extractor.extract_data(start_date, end_date)
-        slas_df = self.sla_extractor.extract_data(start_date, end_date)
-        time_worked_df = self.time_worked_extractor.extract_data(
-            start_date, end_date
-        )
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            tasks_future = executor.submit(
+                self.task_extractor.extract_data, start_date, end_date
+            )
+            slas_future = executor.submit(
+                self.sla_extractor.extract_data, start_date, end_date
+            )
+            time_worked_future = executor.submit(
+                self.time_worked_extractor.extract_data, start_date, end_date
+            )
 
-        extraction_time = time.time() - start_time
+            tasks_df = tasks_future.result()
+            slas_df = slas_future.result()
+            time_worked_df = time_worked_future.result()
 
         # Imprime métricas da API
         self.incident_extractor.print_api_metrics("Incidentes")
@@ -126,114 +179,146 @@ class ServiceNowETL:
         self.sla_extractor.print_api_metrics("SLAs")
         self.time_worked_extractor.print_api_metrics("Tempo Trabalhado")
 
-        # 4. Prepara DataFrames para salvamento
-        incident_dataframes = {
+        api_time = (time.perf_counter_ns() - start_ns) / 1e9
+        self.log.info(f"\n⏱️  Tempo incidentes - API: {api_time:.2f}s")
+
+        return {
             "incident": incidents_df,
             "incident_task": tasks_df,
             "incident_sla": slas_df,
             "task_time_worked": time_worked_df,
         }
 
-        # 5. Salva no banco
-        db_start_time = time.time()
+    def _save_incident_frames(self, incident_dataframes: dict) -> bool:
+        """Grava os dados de incidentes no banco"""
+        db_start_ns = time.perf_counter_ns()
+
         success = self.db_manager.save_dataframes_to_database(
             incident_dataframes
         )
-        # 6. Salva em JSON comprimido se habilitado
-
-        if self.enable_json_storage and success:
-            extraction_metrics = {
-                "total_requests": (
-                    self.incident_extractor.get_api_metrics()["total_requests"]
-                    + self.task_extractor.get_api_metrics()["total_requests"]
-                    + self.sla_extractor.get_api_metrics()["total_requests"]
-                    + self.time_worked_extractor.get_api_metrics()[
-                        "total_requests"
-                    ]
-                )
-            }
-
-            json_success = self.json_manager.save_json_data_to_db(
-                incident_dataframes,
-                extraction_type="daily" if start_date == end_date else "range",
-                start_date=start_date,
-                end_date=end_date,
-                extraction_metrics=extraction_metrics,
-            )
-
-            if json_success:
-                print("✅ Dados também salvos em formato JSON comprimido")
-
-        db_end_time = time.time()
 
         # Atualiza logger se disponível
         if self.logger:
-            self.logger.add_processed_table("incident", len(incidents_df))
-            self.logger.add_processed_table("incident_task", len(tasks_df))
-            self.logger.add_processed_table("incident_sla", len(slas_df))
-            self.logger.add_processed_table(
-                "task_time_worked", len(time_worked_df)
+            self.logger.add_processed_tables(
+                {
+                    table_name: df.height
+                    for table_name, df in incident_dataframes.items()
+                }
             )
 
-        total_time = time.time() - start_time
-        db_time = db_end_time - db_start_time
-        api_time = extraction_time
-
-        print(
-            f"\n⏱️  Tempo incidentes - Total: {total_time:.2f}s | API: {api_time:.2f}s | BD: {db_time:.2f}s"
-        )
+        db_time = (time.perf_counter_ns() - db_start_ns) / 1e9
+        self.log.info(f"⏱️  Tempo incidentes - BD: {db_time:.2f}s")
 
         if success:
-            print("✅ Dados de incidentes salvos com sucesso")
+            self.log.info("✅ Dados de incidentes salvos com sucesso")
         else:
-            print("❌ Erro ao salvar dados de incidentes")
+            self.log.error("❌ Erro ao salvar dados de incidentes")
 
         return success
 
+    def _save_incident_json(
+        self,
+        incident_dataframes: dict,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+    ):
+        """
+        Salva os dados de incidentes em JSON comprimido, se habilitado.
+
+        Deve ser chamado só depois que os dados foram confirmados no banco:
+        o JSON é gravado em uma conexão própria e não acompanha um rollback.
+        """
+        if not self.enable_json_storage:
+            return
+
+        total_rows = sum(df.height for df in incident_dataframes.values())
+        if total_rows < self.MIN_JSON_ROWS:
+            self.log.info(
+                f"ℹ️ Armazenamento JSON ignorado: apenas {total_rows} registros"
+            )
+            return
+
+        extraction_metrics = {
+            "total_requests": sum(
+                extractor.metrics.total_requests
+                for extractor in (
+                    self.incident_extractor,
+                    self.task_extractor,
+                    self.sla_extractor,
+                    self.time_worked_extractor,
+                )
+            )
+        }
+
+        json_success = self.json_manager.save_json_data_to_db(
+            incident_dataframes,
+            extraction_type="daily" if start_date == end_date else "range",
+            start_date=start_date,
+            end_date=end_date,
+            extraction_metrics=extraction_metrics,
+        )
+
+        if json_success:
+            self.log.info("✅ Dados também salvos em formato JSON comprimido")
+
     def run_full_etl(
         self,
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
     ):
         """Executa o processo completo de ETL"""
-        print("🚀 Iniciando processo completo de ETL do ServiceNow")
-        print(f"⏰ INÍCIO: {datetime.datetime.now()}")
+        self.log.info("🚀 Iniciando processo completo de ETL do ServiceNow")
+        self.log.info(f"⏰ INÍCIO: {datetime.datetime.now()}")
 
-        etl_start_time = time.time()
+        etl_start_ns = time.perf_counter_ns()
 
         try:
-            # 1. Extrai dados de configuração
-            if not self.extract_configuration_data():
-                print("❌ Falha na extração de dados de configuração")
-                return False
+            # 1. Extrai tudo da API antes de abrir a transação, para que
+            # nenhum lock fique aberto durante as requisições ao ServiceNow
+            config_dataframes = self._extract_configuration_frames()
+            incident_dataframes = self._extract_incident_frames(
+                start_date, end_date
+            )
 
-            # 2. Extrai dados de incidentes
-            if not self.extract_incident_data(start_date, end_date):
-                print("❌ Falha na extração de dados de incidentes")
-                return False
+            # 2. Configuração e incidentes são confirmados em um único commit
+            with self.db_manager.transaction():
+                if not self._save_configuration_frames(config_dataframes):
+                    self.log.error("❌ Falha ao salvar dados de configuração")
+                    return False
+
+                if incident_dataframes and not self._save_incident_frames(
+                    incident_dataframes
+                ):
+                    self.log.error("❌ Falha ao salvar dados de incidentes")
+                    return False
+
+            # 3. JSON só depois do commit, para não sobreviver a um rollback
+            if incident_dataframes:
+                self._save_incident_json(
+                    incident_dataframes, start_date, end_date
+                )
 
-            etl_end_time = time.time()
-            total_etl_time = etl_end_time - etl_start_time
+            total_etl_time = (time.perf_counter_ns() - etl_start_ns) / 1e9
 
-            # 3. Imprime métricas finais
+            # 4. Imprime métricas finais
             self.print_final_metrics(total_etl_time)
 
-            print(f"⏰ FIM: {datetime.datetime.now()}")
-            print("🎉 Processo ETL concluído com sucesso!")
+            self.log.info(f"⏰ FIM: {datetime.datetime.now()}")
+            self.log.info("🎉 Processo ETL concluído com sucesso!")
             return True
 
         except Exception as e:
-            print(f"❌ Erro durante execução do ETL: {e}")
+            self.log.error(f"❌ Erro durante execução do ETL: {e}")
             return False
 
     def print_final_metrics(self, total_etl_time: float):
         """Imprime um resumo final das métricas de performance"""
-        print("\n" + "=" * 60)
-        print("📊 RESUMO FINAL DE PERFORMANCE")
-        print("=" * 60)
+        self.log.info("\n" + "=" * 60)
+        self.log.info("📊 RESUMO FINAL DE PERFORMANCE")
+        self.log.info("=" * 60)
 
         # Métricas gerais
-        print(
+        self.log.info(
             f"⏱️  Tempo total do ETL: {total_etl_time:.2f}s ({total_etl_time / 60:.1f} minutos)"
         )
 
@@ -247,15 +332,21 @@ class ServiceNowETL:
             ("Grupos", self.group_extractor),
         ]
 
-        total_api_requests = 0
-        total_api_time = 0.0
-        total_failed_requests = 0
+        import polars as pl
 
-        for name, extractor in all_extractors:
-            metrics = extractor.get_api_metrics()
-            total_api_requests += metrics["total_requests"]
-            total_api_time += metrics["total_api_time"]
-            total_failed_requests += metrics["failed_requests"]
+        metrics_df = pl.DataFrame(
+            [
+                {"name": name, **extractor.get_api_metrics()}
+                for name, extractor in all_extractors
+            ]
+        )
+        total_api_requests, total_api_time, total_failed_requests = (
+            metrics_df.select(
+                pl.col("total_requests").sum(),
+                pl.col("total_api_time").sum(),
+                pl.col("failed_requests").sum(),
+            ).row(0)
+        )
 
         # Métricas consolidadas da API
         if total_api_requests > 0:
@@ -265,12 +356,18 @@ class ServiceNowETL:
                 / total_api_requests
             ) * 100
 
-            print("\n🌐 Resumo API ServiceNow:")
-            print(f"   ├── Total de requisições: {total_api_requests:,}")
-            print(f"   ├── Requisições falharam: {total_failed_requests}")
-            print(f"   ├── Taxa de sucesso: {api_success_rate:.1f}%")
-            print(f"   ├── Tempo total API: {total_api_time:.2f}s")
-            print(f"   └── Tempo médio/requisição: {avg_api_time:.3f}s")
+            self.log.info("\n🌐 Resumo API ServiceNow:")
+            self.log.info(
+                f"   ├── Total de requisições: {total_api_requests:,}"
+            )
+            self.log.info(
+                f"   ├── Requisições falharam: {total_failed_requests}"
+            )
+            self.log.info(f"   ├── Taxa de sucesso: {api_success_rate:.1f}%")
+            self.log.info(f"   ├── Tempo total API: {total_api_time:.2f}s")
+            self.log.info(
+                f"   └── Tempo médio/requisição: {avg_api_time:.3f}s"
+            )
 
         # Métricas do banco de dados
         self.db_manager.print_db_metrics()
@@ -281,7 +378,7 @@ class ServiceNowETL:
 
         # Atualiza métricas no logger se disponível
         if self.logger:
-            self.logger.update_api_metrics(all_extractors)
+            self.logger.update_api_metrics(metrics_df)
             self.logger.update_db_metrics(self.db_manager)
             if self.enable_json_storage:
                 self.logger.update_json_metrics(self.json_manager)
@@ -289,66 +386,103 @@ class ServiceNowETL:
         # Cálculo de eficiência
         if total_etl_time > 0:
             api_percentage = (total_api_time / total_etl_time) * 100
-            print("\n📈 Análise de Performance:")
-            print(
+            self.log.info("\n📈 Análise de Performance:")
+            self.log.info(
                 f"   ├── Tempo gasto com API: {api_percentage:.1f}% do total"
             )
-            print(
+            self.log.info(
                 f"   └── Throughput: {total_api_requests / total_etl_time:.1f} requisições/segundo"
             )
 
-        print("=" * 60)
+        self.log.info("=" * 60)
 
     def run_daily_etl(self, days_back: int = 3):
         """Executa ETL para os últimos N dias"""
         today = datetime.date.today()
 
-        print(f"📅 Executando ETL diário para os últimos {days_back} dias")
+        self.log.info(
+            f"📅 Executando ETL diário para os últimos {days_back} dias"
+        )
 
-        for i in range(days_back, -1, -1):
-            day = today - datetime.timedelta(days=i)
-            date_str = day.strftime("%Y-%m-%d")
+        # Datas calculadas uma única vez (isoformat já gera YYYY-MM-DD)
+        dates = [
+            (today - datetime.timedelta(days=i)).isoformat()
+            for i in range(days_back, -1, -1)
+        ]
 
-            print(f"\n📅 Processando dia: {date_str}")
+        # A API de cada dia é consultada em paralelo, mas a gravação é feita
+        # aqui, um dia por vez e em ordem de data: MERGEs concorrentes nas
+        # mesmas tabelas só se bloqueariam (e arriscariam deadlock)
+        success = True
+        with ThreadPoolExecutor(max_workers=min(len(dates), 4)) as executor:
+            futures = {
+                date_str: executor.submit(self._extract_day, date_str)
+                for date_str in dates
+            }
 
-            success = self.extract_incident_data(
-                start_date=date_str, end_date=date_str, include_backlog=False
-            )
+            for date_str, future in futures.items():
+                if not self._save_day(date_str, future):
+                    self.log.error(f"❌ Falha ao processar dia {date_str}")
+                    success = False
 
-            if not success:
-                print(f"❌ Falha ao processar dia {date_str}")
-                return False
+        return success
 
-        return True
+    def _extract_day(self, date_str: str) -> dict:
+        """Extrai os dados de incidentes de um único dia (sem gravar)"""
+        self.log.info(f"\n📅 Processando dia: {date_str}")
+        return self._extract_incident_frames(
+            start_date=date_str, end_date=date_str
+        )
+
+    def _save_day(self, date_str: str, future: Future) -> bool:
+        """Aguarda a extração de um dia e grava seus dados no banco"""
+        try:
+            incident_dataframes = future.result()
+            if not incident_dataframes:
+                return True
+
+            success = self._save_incident_frames(incident_dataframes)
+            if success:
+                self._save_incident_json(
+                    incident_dataframes, date_str, date_str
+                )
+            return success
+        except Exception as e:
+            # Ex.: página da API que falhou; o dia é marcado como falho
+            self.log.error(f"❌ Erro ao processar dia {date_str}: {e}")
+            return False
 
 
-def main():
-    """Função principal com interface melhorada"""
+def main() -> int:
+    """Função principal com interface melhorada. Retorna o código de saída"""
 
     # Ajuda e validação de argumentos
     if len(sys.argv) < 2:
         print_usage()
-        return
+        return 1
 
     command = sys.argv[1].lower()
 
     # Comandos especiais
     if command in ["help", "--help", "-h"]:
         print_usage()
-        return
+        return 0
     elif command == "logs":
         print_recent_executions()
-        return
+        return 0
     elif command == "analyze":
+        from analyzer.storage_analyzer import StorageAnalyzer
+
         analyzer = StorageAnalyzer()
         analyzer.print_detailed_analysis()
-        return
+        return 0
 
     # Verifica se deve habilitar armazenamento JSON (comandos antigos)
     enable_json = "--json" in sys.argv or "-j" in sys.argv
 
     # Cria logger de execução
     logger = ExecutionLogger()
+    success = False
 
     try:
         etl = ServiceNowETL(enable_json_storage=enable_json, logger=logger)
@@ -356,8 +490,6 @@ def main():
         if enable_json:
             print("📄 Armazenamento JSON comprimido HABILITADO")
 
-        success = False
-
         if command == "config":
             logger.set_execution_params("config", json_enabled=enable_json)
             success = etl.extract_configuration_data()
@@ -383,7 +515,7 @@ def main():
                     "   Uso: python main.py range YYYY-MM-DD YYYY-MM-DD [--json]"
                 )
                 print("   Exemplo: python main.py range 2025-09-01 2025-09-15")
-                return
+                return 1
 
             start_date = sys.argv[2]
             end_date = sys.argv[3]
@@ -394,7 +526,7 @@ def main():
             ) or not validate_date_format(end_date):
                 print("❌ Erro: Formato de data inválido. Use YYYY-MM-DD")
                 print("   Exemplo: 2025-09-15")
-                return
+                return 1
 
             logger.set_execution_params(
                 "range", start_date, end_date, enable_json
@@ -422,7 +554,7 @@ def main():
         else:
             print(f"❌ Comando desconhecido: {command}")
             print_usage()
-            return
+            return 1
 
         # Finaliza log baseado no sucesso
         if success:
@@ -445,6 +577,8 @@ def main():
         logger.save_to_database()
         logger.print_execution_summary()
 
+    return 0 if success else 1
+
 
 def validate_date_format(date_string: str) -> bool:
     """Valida formato de data YYYY-MM-DD"""
@@ -567,4 +701,4 @@ def print_usage():
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -10,7 +10,7 @@ BEGIN
         start_date DATE NULL, -- Para filtros de período
         end_date DATE NULL,   -- Para filtros de período
         data_json NVARCHAR(MAX) NOT NULL, -- Dados JSON compactados
-        data_compressed VARBINARY(MAX) NULL, -- Dados comprimidos com gzip (opcional)
+        data_compressed VARBINARY(MAX) NULL, -- Dados comprimidos com zstd (opcional; registros antigos em gzip)
         record_count INT NOT NULL DEFAULT 0, -- Total de registros no JSON
         json_size_kb DECIMAL(10,2) NOT NULL DEFAULT 0, -- Tamanho do JSON em KB
         compressed_size_kb DECIMAL(10,2) NULL, -- Tamanho comprimido em KB
@@ -44,7 +44,7 @@ EXEC sp_addextendedproperty
 -- Comentários das colunas principais
 EXEC sp_addextendedproperty @name = N'MS_Description', @value = N'Data da extração dos dados', @level0type = N'SCHEMA', @level0name = N'dbo', @level1type = N'TABLE', @level1name = N'servicenow_data_json', @level2type = N'COLUMN', @level2name = N'data_extraction';
 EXEC sp_addextendedproperty @name = N'MS_Description', @value = N'Dados JSON compactados contendo incidentes, tarefas, SLAs, etc.', @level0type = N'SCHEMA', @level0name = N'dbo', @level1type = N'TABLE', @level1name = N'servicenow_data_json', @level2type = N'COLUMN', @level2name = N'data_json';
-EXEC sp_addextendedproperty @name = N'MS_Description', @value = N'Dados comprimidos com gzip para máxima economia de espaço', @level0type = N'SCHEMA', @level0name = N'dbo', @level1type = N'TABLE', @level1name = N'servicenow_data_json', @level2type = N'COLUMN', @level2name = N'data_compressed';
+EXEC sp_addextendedproperty @name = N'MS_Description', @value = N'Dados comprimidos com zstd (registros antigos em gzip, identificados pelo cabeçalho)', @level0type = N'SCHEMA', @level0name = N'dbo', @level1type = N'TABLE', @level1name = N'servicenow_data_json', @level2type = N'COLUMN', @level2name = N'data_compressed';
 EXEC sp_addextendedproperty @name = N'MS_Description', @value = N'Total de registros armazenados no JSON', @level0type = N'SCHEMA', @level0name = N'dbo', @level1type = N'TABLE', @level1name = N'servicenow_data_json', @level2type = N'COLUMN', @level2name = N'record_count';
 
 -- View para facilitar consultas
@@ -45,7 +45,7 @@ BEGIN
         -- Controle ETL
         etl_created_at DATETIME2 DEFAULT GETDATE(),
         etl_updated_at DATETIME2 DEFAULT GETDATE(),
-        etl_hash NVARCHAR(64) NULL -- Para controle de mudanças
+        etl_hash BIGINT NULL -- Para controle de mudanças (hash Polars 64 bits, não criptográfico)
     );
     
     PRINT '✅ Tabela sys_company criada com sucesso!';
@@ -0,0 +1,25 @@
+-- ================================================================
+-- MIGRAÇÃO: sys_company.etl_hash DE NVARCHAR(64) PARA BIGINT
+-- O hash de controle de mudanças passou a ser o hash Polars de 64 bits,
+-- gravado como inteiro (8 bytes) em vez de texto hexadecimal
+-- ================================================================
+
+IF EXISTS (
+    SELECT * FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_NAME = 'sys_company'
+    AND COLUMN_NAME = 'etl_hash'
+    AND DATA_TYPE <> 'bigint'
+)
+BEGIN
+    -- Hashes antigos (md5/texto) não são compatíveis com o novo formato;
+    -- a próxima carga recalcula todos
+    UPDATE sys_company SET etl_hash = NULL;
+
+    ALTER TABLE sys_company ALTER COLUMN etl_hash BIGINT NULL;
+
+    PRINT '✅ Coluna sys_company.etl_hash convertida para BIGINT';
+END
+ELSE
+BEGIN
+    PRINT 'ℹ️ Coluna sys_company.etl_hash já está em BIGINT';
+END
@@ -16,6 +16,22 @@ class Config:
     SERVICENOW_BASE_URL = os.getenv('SERVICENOW_BASE_URL')
     SERVICENOW_USERNAME = os.getenv('SERVICENOW_USERNAME')
     SERVICENOW_PASSWORD = os.getenv('SERVICENOW_PASSWORD')
+    # Registros por página nas consultas paginadas (sysparm_limit)
+    SERVICENOW_PAGE_SIZE = int(os.getenv('SERVICENOW_PAGE_SIZE', '10000'))
+    # Timeouts das requisições em segundos: (conexão, leitura). Sem valor
+    # explícito, a leitura cresce com a página: 30s + 1s a cada 100 registros
+    SERVICENOW_TIMEOUT = (
+        float(os.getenv('SERVICENOW_CONNECT_TIMEOUT', '5')),
+        float(
+            os.getenv('SERVICENOW_READ_TIMEOUT')
+            or 30 + SERVICENOW_PAGE_SIZE / 100
+        ),
+    )
+    # Envia sysparm_fields nas consultas de incidentes; com 'false' a API
+    # devolve todos os campos e o DataFrame continua limitado ao schema
+    SERVICENOW_SEND_FIELDS = (
+        os.getenv('SERVICENOW_SEND_FIELDS', 'true').lower() == 'true'
+    )
     
     # Database
     DB_DRIVER = os.getenv('DB_DRIVER')
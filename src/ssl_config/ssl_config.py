@@ -7,6 +7,8 @@ import warnings
 
 import urllib3
 
+_ssl_disabled = False
+
 
 def disable_ssl_warnings():
     """
@@ -18,7 +20,13 @@ def disable_ssl_warnings():
 
     ⚠️ ATENÇÃO: Usar apenas em ambientes de desenvolvimento!
     Em produção, configure certificados SSL adequados.
+
+    Chamadas repetidas não têm efeito.
     """
+    global _ssl_disabled
+
+    if _ssl_disabled:
+        return
 
     # Desabilita verificação SSL globalmente
     ssl._create_default_https_context = ssl._create_unverified_context
@@ -29,10 +37,9 @@ def disable_ssl_warnings():
     # Desabilita warnings gerais sobre SSL
     warnings.filterwarnings("ignore", message="Unverified HTTPS request")
 
+    _ssl_disabled = True
     print("⚠️  SSL verification disabled - use only in development!")
 
 
 # Chama automaticamente quando o módulo é importado
-disable_ssl_warnings()  # Chama automaticamente quando o módulo é importado
-disable_ssl_warnings()  # Chama automaticamente quando o módulo é importado
 disable_ssl_warnings()
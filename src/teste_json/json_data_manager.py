@@ -3,19 +3,25 @@ Gerenciador de dados JSON compactados para ServiceNow
 """
 
 import gzip
-import json
 import time
 from datetime import date, datetime
 from typing import Any, Dict, Optional
 
+import orjson
 import polars as pl
+import zstandard
 
 from settings.config import get_db_connection
 
+# Assinatura dos blobs gzip gravados antes da troca para zstd
+GZIP_MAGIC = b"\x1f\x8b"
+
 
 class JSONDataManager:
     """Gerenciador para armazenamento de dados ServiceNow em formato JSON compactado"""
 
+    ZSTD_LEVEL = 3
+
     def __init__(self):
         self.compression_enabled = True
         self.json_metrics = {
@@ -28,12 +34,9 @@ class JSONDataManager:
 
     def compact_json_data(self, data: Dict[str, Any]) -> str:
         """Converte dados para JSON no formato mais compacto possível"""
-        # Configurações para JSON mínimo
-        return json.dumps(
-            data,
-            separators=(",", ":"),  # Remove espaços
-            ensure_ascii=False,  # Permite caracteres UTF-8
-            default=self._json_serializer,
+        # orjson já gera JSON sem espaços, em UTF-8 e com datas em ISO 8601
+        return orjson.dumps(data, default=self._json_serializer).decode(
+            "utf-8"
         )
 
     def _json_serializer(self, obj):
@@ -47,12 +50,22 @@ class JSONDataManager:
         return str(obj)
 
     def compress_data(self, json_string: str) -> bytes:
-        """Comprime dados JSON usando gzip"""
-        return gzip.compress(json_string.encode("utf-8"), compresslevel=9)
+        """Comprime dados JSON usando zstd (multithread)"""
+        compressor = zstandard.ZstdCompressor(
+            level=self.ZSTD_LEVEL, threads=-1
+        )
+        return compressor.compress(json_string.encode("utf-8"))
 
     def decompress_data(self, compressed_data: bytes) -> str:
-        """Descomprime dados JSON"""
-        return gzip.decompress(compressed_data).decode("utf-8")
+        """Descomprime dados JSON (zstd, ou gzip para registros antigos)"""
+        compressed_data = bytes(compressed_data)
+        if compressed_data.startswith(GZIP_MAGIC):
+            return gzip.decompress(compressed_data).decode("utf-8")
+        return (
+            zstandard.ZstdDecompressor()
+            .decompress(compressed_data)
+            .decode("utf-8")
+        )
 
     def calculate_sizes(
         self, json_string: str, compressed_data: bytes = None
@@ -287,7 +300,7 @@ class JSONDataManager:
                         # Dados estão em JSON puro
                         json_string = json_data
 
-                    return json.loads(json_string)
+                    return orjson.loads(json_string)
 
                 return None
 